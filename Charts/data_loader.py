@@ -1,20 +1,41 @@
 # File: data_loader.py
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
 
-# Load financial data from CSV
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Price data files written by Data/download_ohlc.py, in order of preference
+DATA_FILE_EXTENSIONS = ('.parquet', '.csv')
+
+# Load financial data from CSV or Parquet
 def load_data(csv_file):
-    """Load financial data from a CSV file with yfinance multi-header format."""
-    # Read CSV skipping the ticker row (row 1) and datetime header row (row 2)
+    """Load financial data from a CSV file with yfinance multi-header format, or a Parquet file."""
+    if str(csv_file).endswith('.parquet'):
+        df = pd.read_parquet(csv_file, columns=OHLCV_COLUMNS)
+        df.index = pd.to_datetime(df.index, utc=True)
+        df.index.name = 'Datetime'
+        return df
+
     # Rows: 0=columns, 1=ticker, 2=datetime header, 3+=data
-    df = pd.read_csv(csv_file, skiprows=[1, 2])
-    
-    # The first column is 'Price' but contains datetime values
-    time_col = df.columns[0]  # This is 'Price'
-    
+    # Column names come from row 0; the ticker and datetime header rows are skipped
+    # and only the time column plus OHLCV are parsed
+    time_col = 'Price'  # The first column is 'Price' but contains datetime values
+    table = pacsv.read_csv(
+        csv_file,
+        read_options=pacsv.ReadOptions(skip_rows_after_names=2),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=[time_col] + OHLCV_COLUMNS,
+            # Daily files carry bare dates, so timestamps are parsed by pandas below
+            column_types={time_col: pa.string()},
+        ),
+    )
+    df = table.to_pandas(self_destruct=True)
+
     # Parse datetime and set as index
-    df[time_col] = pd.to_datetime(df[time_col], utc=True)
+    df[time_col] = pd.to_datetime(df[time_col], utc=True, format='ISO8601', cache=True)
     df.set_index(time_col, inplace=True)
     df.index.name = 'Datetime'
-    
+
     # Return only OHLCV columns
-    return df[['Open', 'High', 'Low', 'Close', 'Volume']]
\ No newline at end of file
+    return df.loc[:, OHLCV_COLUMNS]
@@ -8,14 +8,23 @@ def price_to_pixel(value, min_price, max_price, height):
     return height - int((value - min_price) / scale) - 1
 
 def create_candlestick_with_regression_image(data, height=224, candlestick_width=3, spacing=1, blur=False, blur_radius=0, draw_regression_lines=True, color_candles=True):
-    """Create a candlestick image with bull and bear candles in different colors, and draw regression lines below."""
-    num_candlesticks = len(data)
-    min_price = data[['Low']].min().min()
-    max_price = data[['High']].max().max()
+    """Create a candlestick image with bull and bear candles in different colors, and draw regression lines below.
+
+    `data` is either a DataFrame with Open/High/Low/Close columns or an ndarray whose first four
+    columns are Open, High, Low, Close (the load_data column order).
+    """
+    if hasattr(data, 'to_numpy'):
+        data = data[['Open', 'High', 'Low', 'Close']].to_numpy()
+    ohlc = np.asarray(data, dtype=np.float64)[:, :4]
+    opens, highs, lows, closes = ohlc.T
+
+    num_candlesticks = len(ohlc)
+    min_price = lows.min()
+    max_price = highs.max()
 
     # Calculate price change in pixels using the difference between last close and first open
-    first_open_price = data['Open'].iloc[0]
-    last_close_price = data['Close'].iloc[-1]
+    first_open_price = opens[0]
+    last_close_price = closes[-1]
     price_change_pixels = price_to_pixel(last_close_price, min_price, max_price, height) - price_to_pixel(first_open_price, min_price, max_price, height)
 
     total_width = (candlestick_width + spacing) * num_candlesticks
@@ -25,8 +34,7 @@ def create_candlestick_with_regression_image(data, height=224, candlestick_width
     draw = ImageDraw.Draw(image)
 
     # Draw the candlesticks
-    for i, (index, row) in enumerate(data.iterrows()):
-        open_price, high_price, low_price, close_price = row['Open'], row['High'], row['Low'], row['Close']
+    for i, (open_price, high_price, low_price, close_price) in enumerate(ohlc.tolist()):
 
         # Convert prices to pixel positions for the upper half of the image
         open_pixel = price_to_pixel(open_price, min_price, max_price, height)
@@ -52,17 +60,10 @@ def create_candlestick_with_regression_image(data, height=224, candlestick_width
         bottom_pixel = max(open_pixel, close_pixel)
         draw.rectangle([x_start, top_pixel, x_start + candlestick_width - 1, bottom_pixel], fill=color)
 
-    # Prepare data for regression calculation by treating each (Open, High, Low, Close) as separate data points
-    x_values = []
-    y_values = []
-
-    for i in range(num_candlesticks):
-        # Four data points per candlestick
-        x_values.extend([i * 4, i * 4 + 1, i * 4 + 2, i * 4 + 3])
-        y_values.extend([data['Open'].iloc[i], data['High'].iloc[i], data['Low'].iloc[i], data['Close'].iloc[i]])
-
-    x_values = np.array(x_values)
-    y_values = np.array(y_values)
+    # Prepare data for regression calculation by treating each (Open, High, Low, Close) as separate data points:
+    # four data points per candlestick, flattened row by row
+    x_values = np.arange(num_candlesticks * 4)
+    y_values = ohlc.reshape(-1)
 
     # Calculate regression for all data
     coefficients = np.polyfit(x_values, y_values, 1)
@@ -1,56 +1,118 @@
-import os
-import shutil
-import json
+import re
+import functools
+import orjson
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from typing import Optional
 from datetime import datetime
+from numba_utils import njit
 
+# 64 KiB buffer so large JSON payloads move in a handful of syscalls
+_IO_BUFFER_SIZE = 1 << 16
 
+# All 16 shape strings, indexed by a 4-bit mask where bit b is set when slope b is positive
+_SHAPE_TABLE = [''.join('p' if (i >> b) & 1 else 'n' for b in range(4)) for i in range(16)]
+
+# "YYYY-MM-DD HH-MM-SS" (time optional) occupying a whole '_'-delimited segment of an image key
+_TIMESTAMP_RE = re.compile(r'(?:^|_)(\d{4})-(\d{2})-(\d{2})(?: (\d{2})-(\d{2})-(\d{2}))?(?=_|$)')
+
+
+def read_json(path):
+    """Load a JSON file with orjson."""
+    with open(path, 'rb', buffering=_IO_BUFFER_SIZE) as file:
+        return orjson.loads(file.read())
+
+
+def write_json(path, data):
+    """Serialize data with orjson (numpy scalars/arrays allowed) and write it in one call."""
+    payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    with open(path, 'wb', buffering=_IO_BUFFER_SIZE) as file:
+        file.write(payload)
+
+
+# Per-image fields produced by process_data_into_images
+REGRESSION_FIELDS = ["slope_first", "slope_second", "slope_third", "slope_whole",
+                     "max_dev", "price_change", "colored_pixels_ratio", "current_price"]
+_SLOPE_FIELDS = REGRESSION_FIELDS[:4]
+
+
+def write_regression_parquet(path, regression_data):
+    """Store regression data as a zstd-compressed Parquet table with one row per image filename."""
+    records = list(regression_data.values())
+    columns = {"filename": list(regression_data)}
+    for name in REGRESSION_FIELDS:
+        columns[name] = [record[name] for record in records]
+    pq.write_table(pa.Table.from_pydict(columns), path, compression='zstd')
+
+
+def regression_columns(regression_data):
+    """Split a {filename: record} mapping into (keys, columns), skipping non-record entries such as _comments.
+
+    Numeric fields come back as float64 arrays.
+    """
+    keys, records = [], []
+    for key, value in regression_data.items():
+        if isinstance(value, dict):
+            keys.append(key)
+            records.append(value)
+    columns = {name: np.array([r[name] for r in records], dtype=np.float64) for name in REGRESSION_FIELDS[:-1]}
+    columns["current_price"] = [r.get("current_price") for r in records]
+    return keys, columns
+
+
+@functools.lru_cache(maxsize=65536)
 def _extract_timestamp_from_key(key: str) -> Optional[datetime]:
     """Extract timestamp from filename-like keys such as TICKER_tf_window_YYYY-MM-DD HH-MM-SS_*.png."""
-    parts = key.replace('.png', '').split('_')
-    
-    for part in parts:
-        # Check if this part contains a full datetime (e.g., "2010-01-26 00-00-00")
-        if ' ' in part and part.count('-') == 4:  # Date has 2 dashes, time has 2 dashes
-            try:
-                return datetime.strptime(part, "%Y-%m-%d %H-%M-%S")
-            except ValueError:
-                continue
-        
-        # Check if this part is just a date (YYYY-MM-DD)
-        if part.count('-') == 2 and len(part) == 10:
-            # Look for time in next parts or default to 00-00-00
-            try:
-                return datetime.strptime(f"{part} 00-00-00", "%Y-%m-%d %H-%M-%S")
-            except ValueError:
-                continue
-    
+    # First '_'-delimited segment that is a valid "YYYY-MM-DD HH-MM-SS" or bare "YYYY-MM-DD" date
+    for match in _TIMESTAMP_RE.finditer(key.replace('.png', '')):
+        year, month, day, hour, minute, second = match.groups(default='0')
+        try:
+            return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+        except ValueError:
+            continue
+
     return None
 
 
-def normalize_json(input_json_path, timeframe):
-    """Normalize regression data and add timeframe-specific trend strength.
+@njit(cache=True)
+def _trend_kernel(max_dev, price_change, colored_pixels_ratio, slopes):
+    """Return (trend strength, 4-bit slope-sign mask) per record from float64 field arrays."""
+    max_dev_mean = max_dev.mean()
+    colored_pixels_mean = colored_pixels_ratio.mean()
 
-    Args:
-        input_json_path: Path to the regression data JSON file
-        timeframe: Timeframe string (e.g., '5m', '1h', '1d', '1wk', '1mo')
-    """
-    epsilon = 1e-6
-    with open(input_json_path, 'r') as file:
-        json_data = json.load(file)
+    if max_dev_mean != 0:
+        max_dev_norm = max_dev / max_dev_mean
+    else:
+        max_dev_norm = np.zeros_like(max_dev)
+    if colored_pixels_mean != 0:
+        colored_pixels_ratio_norm = colored_pixels_ratio / colored_pixels_mean
+    else:
+        colored_pixels_ratio_norm = np.ones_like(colored_pixels_ratio)
 
-    # Replace '_regression_data' with '_trend_price' in filename
-    base, ext = os.path.splitext(input_json_path)
-    output_json_path = base.replace('_regression_data', '_trend_price') + ext
+    # Zero denominators fall back to 0, matching the scalar guards
+    trend_strength = np.where(max_dev_norm != 0,
+                              -price_change / np.where(max_dev_norm != 0, max_dev_norm, 1.0), 0.0)
+    trend_strength = np.where(colored_pixels_ratio_norm != 0,
+                              trend_strength / np.where(colored_pixels_ratio_norm != 0, colored_pixels_ratio_norm, 1.0),
+                              0.0)
 
-    # Extract parameters
-    max_dev_values = [item["max_dev"] for item in json_data.values() if isinstance(item, dict)]
-    colored_pixels_ratios = [item["colored_pixels_ratio"] for item in json_data.values() if isinstance(item, dict)]
+    # Bit b is set when slope b is positive (index into _SHAPE_TABLE)
+    shape_masks = np.zeros(slopes.shape[0], dtype=np.int64)
+    for b in range(slopes.shape[1]):
+        shape_masks |= (slopes[:, b] > 0).astype(np.int64) << b
+    return trend_strength, shape_masks
 
-    max_dev_mean = np.mean(max_dev_values)
-    colored_pixels_mean = np.mean(colored_pixels_ratios)
 
+def normalize_regression_data(keys, columns, timeframe):
+    """Compute the normalized trend & price records for regression data already in memory.
+
+    Args:
+        keys: Image filenames, one per record
+        columns: Field arrays as returned by regression_columns
+        timeframe: Timeframe string (e.g., '5m', '1h', '1d', '1wk', '1mo')
+    """
+    epsilon = 1e-6
     modified_json = {
         "_comments": [
             "shape: sequence of slopes ('n' = negative, 'p' = positive).",
@@ -60,98 +122,29 @@ def normalize_json(input_json_path, timeframe):
         ]
     }
 
-    for key, value in json_data.items():
-        if not isinstance(value, dict):
-            modified_json[key] = value
-            continue
-
+    # Per-record fields arrive as arrays so the arithmetic runs vectorized
+    if keys:
+        slopes = np.column_stack([columns[name] for name in _SLOPE_FIELDS])
+        trend_strength, shape_masks = _trend_kernel(columns["max_dev"], columns["price_change"],
+                                                    columns["colored_pixels_ratio"], slopes)
+        shapes = [_SHAPE_TABLE[m] for m in shape_masks.tolist()]
+        trend_strength = trend_strength.tolist()
+    else:
+        shapes, trend_strength = [], []
+
+    # Timeframe-specific keys are loop-invariant
+    trend_key = f"trend_strength_{timeframe}"
+    price_key = f"last_close_price_{timeframe}"
+
+    for key, shape, trend, current_price in zip(keys, shapes, trend_strength, columns["current_price"]):
         timestamp_dt = _extract_timestamp_from_key(key)
         timestamp_iso = timestamp_dt.isoformat() if timestamp_dt else None
 
-        max_dev = value["max_dev"]
-        price_change = value["price_change"]
-        colored_pixels_ratio = value["colored_pixels_ratio"]
-        current_price = value.get("current_price")
-
-        max_dev_norm = max_dev / max_dev_mean if max_dev_mean else 0
-        colored_pixels_ratio_norm = colored_pixels_ratio / colored_pixels_mean if colored_pixels_mean else 1.0
-
-        trend_strength = -(price_change / max_dev_norm) if max_dev_norm else 0
-
-        slopes = [value["slope_first"], value["slope_second"], value["slope_third"], value["slope_whole"]]
-        shape = "".join("p" if s > 0 else "n" for s in slopes)
-
-        trend_key = f"trend_strength_{timeframe}"
-        price_key = f"last_close_price_{timeframe}"
-
         modified_json[key] = {
             "shape": shape,
-            trend_key: trend_strength / colored_pixels_ratio_norm if colored_pixels_ratio_norm else 0,
+            trend_key: trend,
             price_key: current_price,
             "timestamp": timestamp_iso
         }
 
-    with open(output_json_path, 'w') as file:
-        json.dump(modified_json, file, indent=4)
-
-    print(f"Trend & Price data saved to: {output_json_path}")
-    return output_json_path, modified_json
-
-
-def rename_images_with_trend_strength(output_folder, normalized_json_data, json_file_path):
-    """Rename image files to include normalized trend strength values and update JSON keys."""
-    import os
-
-    renamed_count = 0
-    updated_json = {}
-
-    # Copy non-dict entries (like _comments)
-    for key, value in normalized_json_data.items():
-        if not isinstance(value, dict):
-            updated_json[key] = value
-
-    for filename, data in normalized_json_data.items():
-        if not isinstance(data, dict) or not filename.endswith('.png'):
-            continue
-
-        # Extract trend strength from normalized data (find trend_strength_* key)
-        trend_strength = None
-        for key in data.keys():
-            if key.startswith('trend_strength_'):
-                trend_strength = data[key]
-                break
-
-        if trend_strength is None:
-            updated_json[filename] = data
-            continue
-
-        # Build old and new file paths
-        old_path = os.path.join(output_folder, filename)
-
-        # Check if file already has trend strength (skip if already renamed)
-        if '_trend_' in filename:
-            updated_json[filename] = data
-            continue
-
-        # Insert trend strength before .png extension
-        base_name = filename.replace('.png', '')
-        new_filename = f"{base_name}_trend_{trend_strength:.3f}.png"
-        new_path = os.path.join(output_folder, new_filename)
-
-        # Rename the file
-        if os.path.exists(old_path):
-            os.rename(old_path, new_path)
-            renamed_count += 1
-            # Update JSON with new filename as key
-            updated_json[new_filename] = data
-        else:
-            # File doesn't exist, keep old key
-            updated_json[filename] = data
-
-    # Save updated JSON with new filenames as keys
-    with open(json_file_path, 'w') as f:
-        json.dump(updated_json, f, indent=4)
-
-    print(f"Renamed {renamed_count} images with normalized trend strength values")
-    print(f"Updated JSON file with new filenames")
-    return renamed_count
\ No newline at end of file
+    return modified_json
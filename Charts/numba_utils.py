@@ -0,0 +1,5 @@
+try:
+    from numba import njit
+except ImportError:  # numba is optional; decorated kernels run as plain NumPy without it
+    def njit(*args, **kwargs):
+        return lambda func: func
@@ -1,13 +1,74 @@
 # File: main.py
 import os
-import json
+import shutil
 import sys
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 
+import numpy as np
 import pandas as pd
-from data_loader import load_data
+from data_loader import load_data, OHLCV_COLUMNS, DATA_FILE_EXTENSIONS
 from image_utils import create_candlestick_with_regression_image
-from save_utils import save_candlestick_image
-from json_utils import normalize_json, rename_images_with_trend_strength
+from save_utils import (save_candlestick_image, encode_candlestick_image, candlestick_image_filename,
+                        candlestick_filename_prefix)
+from json_utils import normalize_regression_data, read_json, regression_columns, write_json, write_regression_parquet
+from numba_utils import njit
+
+_CLOSE_COLUMN = OHLCV_COLUMNS.index('Close')
+
+# Written to the image folder after the last image is saved; records what the run was made from
+_RENDER_MARKER = '.render_complete.json'
+
+
+@njit(cache=True)
+def _enumerate_windows(values, window_size, step):
+    """Split window start indices into (valid starts, starts whose window contains a NaN row)."""
+    # Prefix count of rows containing NaN: a window is bad if it spans any of them
+    row_has_nan = (np.isnan(values).sum(axis=1) > 0).astype(np.int64)
+    nan_rows = np.zeros(values.shape[0] + 1, dtype=np.int64)
+    nan_rows[1:] = np.cumsum(row_has_nan)
+
+    # All window starts are checked at once
+    candidates = np.arange(0, values.shape[0] - window_size + 1, step)
+    has_nan = nan_rows[candidates + window_size] - nan_rows[candidates] > 0
+    return candidates[~has_nan], candidates[has_nan]
+
+
+def _render_window(window_values, height, blur, blur_radius, draw_regression_lines, color_candles):
+    """Render the image for one window; returns (PNG bytes, regression entry).
+
+    `window_values` is a zero-copy slice of the OHLCV ndarray, in load_data column order. The image is
+    encoded here (in the worker) but written later, once its final filename is known.
+    """
+    (image, 
+     slope_first, slope_second, slope_third, slope_whole, 
+     price_change, 
+     max_dev_scaled,
+     colored_pixels_ratio) = (
+    create_candlestick_with_regression_image(window_values, 
+                                             height=height, 
+                                             candlestick_width=3, 
+                                             spacing=1, 
+                                             blur=blur, 
+                                             blur_radius=blur_radius,
+                                             draw_regression_lines=draw_regression_lines, 
+                                             color_candles=color_candles))
+    
+    # Get the last close price from the window (current price)
+    current_price = float(window_values[-1, _CLOSE_COLUMN])
+
+    # Regression slopes and additional data for this image
+    return encode_candlestick_image(image), {
+        "slope_first": slope_first,
+        "slope_second": slope_second,
+        "slope_third": slope_third,
+        "slope_whole": slope_whole,
+        "max_dev": max_dev_scaled,
+        "price_change": price_change,
+        "colored_pixels_ratio": colored_pixels_ratio,
+        "current_price": current_price
+    }
 
 def process_data_into_images(csv_file, ticker, timeframe, window_size=56, height=224, 
                              output_folder='data_processed_imgs',
@@ -16,19 +77,43 @@ def process_data_into_images(csv_file, ticker, timeframe, window_size=56, height
                              draw_regression_lines=True,
                              color_candles=True,
                              create_regression_labels=True,
-                             trend_strength_to_img_name=False):
-    """Process all data in the CSV file into candlestick images with specified window size and overlap."""
+                             trend_strength_to_img_name=False,
+                             executor=None,
+                             regression_format='parquet'):
+    """Process all data in the CSV file into candlestick images with specified window size and overlap.
+
+    Windows are rendered on `executor` (e.g. a ProcessPoolExecutor) when given, otherwise serially.
+    Regression data is stored as `regression_format` ('parquet' or 'json'); trend_price output is always JSON.
+    """
     data = load_data(csv_file)
+    render_params = dict(window_size=window_size, height=height, overlap=overlap, blur=blur,
+                         blur_radius=blur_radius, draw_regression_lines=draw_regression_lines,
+                         color_candles=color_candles, create_regression_labels=create_regression_labels,
+                         trend_strength_to_img_name=trend_strength_to_img_name,
+                         regression_format=regression_format)
   
     # Create output folder if it doesn't exist
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     else:
-        # Delete all existing images in the folder
-        for filename in os.listdir(output_folder):
-            if filename.endswith('.png'):
-                file_path = os.path.join(output_folder, filename)
-                os.remove(file_path)
+        # Drop the previous run's marker first so an interrupted run never looks complete
+        marker_path = os.path.join(output_folder, _RENDER_MARKER)
+        if os.path.exists(marker_path):
+            os.remove(marker_path)
+
+        # Delete all existing images in the folder. Only PNGs are removed because the folder
+        # may also hold other files (e.g. a custom output folder with regression data)
+        with os.scandir(output_folder) as entries:
+            contents = list(entries)
+        png_paths = [entry.path for entry in contents if entry.name.endswith('.png')]
+        if len(png_paths) == len(contents):
+            # Nothing else in there: drop and recreate the folder in one go
+            shutil.rmtree(output_folder, ignore_errors=True)
+            os.makedirs(output_folder, exist_ok=True)
+        else:
+            # Unlinks run on a thread pool so the filesystem can work on many of them at once
+            with ThreadPoolExecutor(max_workers=32) as pool:
+                list(pool.map(os.remove, png_paths))
         print(f"Cleared existing images from {output_folder}")
     
     # Calculate the step size for the sliding window to create specified overlap
@@ -37,69 +122,137 @@ def process_data_into_images(csv_file, ticker, timeframe, window_size=56, height
     # Dictionary to store regression slopes for each image
     regression_data = {}
 
+    values = data.to_numpy(dtype=np.float64)
+
     # Slide through the dataset with specified overlap
-    for i in range(0, len(data) - window_size + 1, step_size):
-        window_data = data.iloc[i:i + window_size]
-        if window_data.isnull().values.any():
-            print(f"Skipping window {i}-{i+window_size} due to NaN values")
-            continue
-        # Adjust format for hourly data
-        end_date = window_data.index[-1].strftime('%Y-%m-%d %H-%M-%S')
-        (image, 
-         slope_first, slope_second, slope_third, slope_whole, 
-         price_change, 
-         max_dev_scaled,
-         colored_pixels_ratio) = (
-        create_candlestick_with_regression_image(window_data, 
-                                                 height=height, 
-                                                 candlestick_width=3, 
-                                                 spacing=1, 
-                                                 blur=blur, 
-                                                 blur_radius=blur_radius,
-                                                 draw_regression_lines=draw_regression_lines, 
-                                                 color_candles=color_candles))
-        
-        # Save image without trend strength first (will rename later with normalized value)
-        filename = save_candlestick_image(image, ticker, timeframe, window_size, end_date, 
-                                         output_folder, trend_strength=None)
-
-        # Get the last close price from the window (current price)
-        current_price = float(window_data['Close'].iloc[-1])
-
-        # Save the regression slopes and additional data for this image
-        regression_data[filename] = {
-            "slope_first": slope_first,
-            "slope_second": slope_second,
-            "slope_third": slope_third,
-            "slope_whole": slope_whole,
-            "max_dev": max_dev_scaled,
-            "price_change": price_change,
-            "colored_pixels_ratio": colored_pixels_ratio,
-            "current_price": current_price
-        }
+    starts, skipped = _enumerate_windows(values, window_size, step_size)
+    for i in skipped.tolist():
+        print(f"Skipping window {i}-{i+window_size} due to NaN values")
+    windows = [values[i:i + window_size] for i in starts.tolist()]
+    # Every window end is formatted in one vectorized call
+    end_positions = starts + (window_size - 1)
+    end_dates = data.index[end_positions].strftime('%Y-%m-%d %H-%M-%S').tolist()
+
+    render = partial(_render_window, height=height, blur=blur, blur_radius=blur_radius,
+                     draw_regression_lines=draw_regression_lines, color_candles=color_candles)
+    if executor is None:
+        results = map(render, windows)
+    else:
+        chunksize = max(1, len(windows) // (4 * (os.cpu_count() or 1)))
+        results = executor.map(render, windows, chunksize=chunksize)
+
+    # executor.map keeps submission order, so the JSON stays chronological.
+    # Encoded images are held until their final names (with trend strength) are known
+    filename_prefix = candlestick_filename_prefix(ticker, timeframe, window_size)
+    images = []
+    for end_date, (png_bytes, entry) in zip(end_dates, results):
+        filename = candlestick_image_filename(ticker, timeframe, window_size, end_date,
+                                              filename_prefix=filename_prefix)
+        regression_data[filename] = entry
+        images.append(png_bytes)
+    trend_strengths = [None] * len(images)
+
     #regression lables are only allowed if blur is false 
     #this is do because later we feed the resnet train model with blured images but 
     #want to use proper lables
     if(create_regression_labels and not blur):
-        # Save the regression data to a JSON file
+        # Save the regression data to a Parquet (or JSON) file
         if not os.path.exists(regression_folder):
             os.makedirs(regression_folder)
 
-        regression_file = os.path.join(regression_folder, f"{ticker}_{timeframe}_regression_data.json")
-        with open(regression_file, 'w') as json_file:
-            json.dump(regression_data, json_file, indent=4)
+        if regression_format == 'json':
+            regression_file = os.path.join(regression_folder, f"{ticker}_{timeframe}_regression_data.json")
+            write_json(regression_file, regression_data)
+        else:
+            regression_file = os.path.join(regression_folder, f"{ticker}_{timeframe}_regression_data.parquet")
+            write_regression_parquet(regression_file, regression_data)
         print(f"Regression data saved to '{regression_file}'")
         
-        # Normalize and get the normalized data (pass timeframe as argument)
-        normalized_json_path, normalized_data = normalize_json(regression_file, timeframe)
-        print(f"Trend & Price data saved to '{normalized_json_path}'")
-        
-        # Rename image files with normalized trend strength values if enabled
+        # Normalize in memory (pass timeframe as argument)
+        keys, columns = regression_columns(regression_data)
+        normalized_data = normalize_regression_data(keys, columns, timeframe)
+
+        # Images get the normalized trend strength in their names on first write, so the
+        # trend & price data is keyed by those final names and written exactly once
         if trend_strength_to_img_name:
-            print(f"\nRenaming images with normalized trend strength values...")
-            rename_images_with_trend_strength(output_folder, normalized_data, normalized_json_path)
+            trend_key = f"trend_strength_{timeframe}"
+            trend_strengths = [normalized_data[key][trend_key] for key in keys]
+            renamed_data = {key: value for key, value in normalized_data.items() if not isinstance(value, dict)}
+            for end_date, key, trend_strength in zip(end_dates, keys, trend_strengths):
+                final_name = candlestick_image_filename(ticker, timeframe, window_size, end_date, trend_strength,
+                                                        filename_prefix)
+                renamed_data[final_name] = normalized_data[key]
+            normalized_data = renamed_data
+
+        normalized_json_path = os.path.join(regression_folder, f"{ticker}_{timeframe}_trend_price.json")
+        write_json(normalized_json_path, normalized_data)
+        print(f"Trend & Price data saved to '{normalized_json_path}'")
+
+    # Join the folder once; each save only concatenates its filename
+    output_prefix = os.path.join(output_folder, '')
+    for end_date, png_bytes, trend_strength in zip(end_dates, images, trend_strengths):
+        save_candlestick_image(png_bytes, ticker, timeframe, window_size, end_date,
+                               output_folder, trend_strength=trend_strength, filename_prefix=filename_prefix,
+                               output_prefix=output_prefix)
+    print(f"Saved {len(images)} images to {output_folder}")
+
+    write_json(os.path.join(output_folder, _RENDER_MARKER), _render_marker(csv_file, render_params))
+
+
+def _render_marker(csv_file, params):
+    """Marker contents identifying the data file version and render parameters of a run."""
+    return {"source": os.path.abspath(csv_file), "source_mtime_ns": os.stat(csv_file).st_mtime_ns,
+            "params": params}
+
+
+def find_data_files(ticker_path, timeframe=None):
+    """Price data files in `ticker_path` (optionally only those for `timeframe`), newest first.
+
+    A download saved as both CSV and Parquet resolves to whichever was written last.
+    """
+    with os.scandir(ticker_path) as entries:
+        files = [(entry.stat().st_mtime_ns, entry.name) for entry in entries
+                 if entry.name.endswith(DATA_FILE_EXTENSIONS) and (timeframe is None or timeframe in entry.name)]
+    files = [name for _, name in sorted(files, reverse=True)]
+
+    # Warn about stale copies left behind by switching download formats
+    seen = set()
+    for name in files:
+        stem = os.path.splitext(name)[0]
+        if stem in seen:
+            print(f"⚠ {stem} exists as both CSV and Parquet; using the newer file, ignoring {name}")
+        seen.add(stem)
+    return files
+
+
+def is_up_to_date(csv_file, output_folder, params):
+    """True when the last run into `output_folder` finished from this version of `csv_file` with `params`."""
+    try:
+        return read_json(os.path.join(output_folder, _RENDER_MARKER)) == _render_marker(csv_file, params)
+    except (OSError, ValueError):
+        return False
 
 
+def _process_job(job):
+    """Process one (ticker, timeframe) batch job; returns (ticker, timeframe, error message or None)."""
+    ticker, timeframe, csv_file, output_folder, regression_folder, params = job
+
+    print(f"\n{'='*60}")
+    print(f"Processing: {ticker} - {timeframe}")
+    print(f"{'='*60}")
+
+    try:
+        process_data_into_images(csv_file, ticker, timeframe, params['window_size'], params['height'],
+                                 output_folder, regression_folder, params['overlap'], params['blur'],
+                                 params['blur_radius'], params['draw_regression_lines'],
+                                 color_candles=params['color_candles'],
+                                 create_regression_labels=params['create_regression_labels'],
+                                 trend_strength_to_img_name=params['trend_strength_to_img_name'],
+                                 regression_format=params['regression_format'])
+    except Exception as e:
+        return ticker, timeframe, str(e)
+    return ticker, timeframe, None
+
 
 if __name__ == "__main__":   
 
@@ -126,7 +279,20 @@ if __name__ == "__main__":
             print(f"Tickers: {', '.join(tickers)}")
             print(f"Intervals: {', '.join(intervals)}\n")
             
-            # Process each combination
+            # Set parameters
+            params = dict(window_size=16,
+                          height=64,
+                          overlap=15,
+                          blur=False,
+                          blur_radius=1.25,
+                          draw_regression_lines=False,
+                          color_candles=True,
+                          create_regression_labels=True,
+                          trend_strength_to_img_name=True,
+                          regression_format='parquet')
+
+            # Collect every ticker/timeframe combination that has data
+            jobs = []
             for ticker in tickers:
                 for timeframe in intervals:
                     ticker_path = os.path.join('Data', ticker.upper())
@@ -136,8 +302,8 @@ if __name__ == "__main__":
                         print(f"⚠ Skipping {ticker} - data folder not found")
                         continue
                     
-                    # Find CSV file
-                    available_files = [f for f in os.listdir(ticker_path) if f.endswith('.csv') and timeframe in f]
+                    # Find CSV (or Parquet) file
+                    available_files = find_data_files(ticker_path, timeframe)
                     if not available_files:
                         print(f"⚠ Skipping {ticker} {timeframe} - CSV not found")
                         continue
@@ -145,33 +311,23 @@ if __name__ == "__main__":
                     csv_file = os.path.join(ticker_path, available_files[0])
                     output_folder = os.path.join('Data_Charts_Images', 'output', ticker.upper(), timeframe, "images")
                     regression_folder = os.path.join('Data_Charts_Images', 'output', ticker.upper(), timeframe, 'regression_data')
-                    
-                    print(f"\n{'='*60}")
-                    print(f"Processing: {ticker} - {timeframe}")
-                    print(f"{'='*60}")
-                    
-                    # Set parameters
-                    window_size = 16
-                    height = 64
-                    overlap = 15
-                    blur = False
-                    blur_radius = 1.25
-                    draw_regression_lines = False
-                    color_candles = True
-                    create_regression_labels = True
-                    trend_strength_to_img_name = True
-                    
-                    # Process
-                    try:
-                        process_data_into_images(csv_file, ticker, timeframe, window_size, height, 
-                                               output_folder, regression_folder, overlap, blur, 
-                                               blur_radius, draw_regression_lines, 
-                                               color_candles=color_candles, 
-                                               create_regression_labels=create_regression_labels,
-                                               trend_strength_to_img_name=trend_strength_to_img_name)
-                        print(f"✓ Completed {ticker} {timeframe}")
-                    except Exception as e:
-                        print(f"✗ Error processing {ticker} {timeframe}: {e}")
+
+                    # A finished run from the same data file and parameters: nothing to re-render
+                    if is_up_to_date(csv_file, output_folder, params):
+                        print(f"✓ Skipping {ticker} {timeframe} - images up to date with {available_files[0]}")
+                        continue
+
+                    jobs.append((ticker, timeframe, csv_file, output_folder, regression_folder, params))
+
+            # Combinations run in parallel, one process each, with a serial window loop
+            # inside so pools are never nested
+            if jobs:
+                with mp.Pool(processes=min(len(jobs), os.cpu_count() or 1)) as pool:
+                    for ticker, timeframe, error in pool.imap_unordered(_process_job, jobs):
+                        if error is None:
+                            print(f"✓ Completed {ticker} {timeframe}")
+                        else:
+                            print(f"✗ Error processing {ticker} {timeframe}: {error}")
             
             print(f"\n{'='*60}")
             print("All processing complete!")
@@ -208,12 +364,12 @@ if __name__ == "__main__":
     # Find the CSV file for the specified timeframe
     available_files = []
     if os.path.exists(ticker_path):
-        available_files = [f for f in os.listdir(ticker_path) if f.endswith('.csv') and timeframe in f]
+        available_files = find_data_files(ticker_path, timeframe)
     if not available_files and not custom_csv:
         print(f"No CSV files available for ticker {ticker} and timeframe {timeframe}.")
         print(f"Available files in {ticker_path}:")
         if os.path.exists(ticker_path):
-            all_files = [f for f in os.listdir(ticker_path) if f.endswith('.csv')]
+            all_files = find_data_files(ticker_path)
             for f in all_files:
                 print(f"  - {f}")
         exit()
@@ -244,7 +400,9 @@ if __name__ == "__main__":
     trend_strength_to_img_name = True  # Include trend strength in image filename
     
     # Process the data and generate images
-    process_data_into_images(csv_file, ticker, timeframe, window_size, height, output_folder, 
-                           regression_folder, overlap, blur, blur_radius, draw_regression_lines, 
-                           color_candles=color_candles, create_regression_labels=create_regression_labels,
-                           trend_strength_to_img_name=trend_strength_to_img_name)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        process_data_into_images(csv_file, ticker, timeframe, window_size, height, output_folder, 
+                               regression_folder, overlap, blur, blur_radius, draw_regression_lines, 
+                               color_candles=color_candles, create_regression_labels=create_regression_labels,
+                               trend_strength_to_img_name=trend_strength_to_img_name,
+                               executor=executor)
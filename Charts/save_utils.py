@@ -1,24 +1,59 @@
+import io
 import os
 
-def save_candlestick_image(image, ticker, timeframe, window_size, end_date, output_folder, trend_strength=None):
+# zlib level 1: much faster to encode than PIL's default (6) for a slightly larger PNG
+PNG_SAVE_OPTIONS = {'format': 'PNG', 'compress_level': 1, 'optimize': False}
+
+def encode_candlestick_image(image):
+    """Encode a candlestick image to PNG bytes.
+
+    Lets worker processes do the compression before the final filename (with trend strength) is known.
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, **PNG_SAVE_OPTIONS)
+    return buffer.getvalue()
+
+def candlestick_filename_prefix(ticker, timeframe, window_size):
+    """The part of the image filename shared by every window of a run."""
+    return f"{ticker}_{timeframe}_{window_size}c_"
+
+def candlestick_image_filename(ticker, timeframe, window_size, end_date, trend_strength=None, filename_prefix=None):
+    """Build the image filename from the ticker, timeframe, window size, end date and optional trend strength.
+
+    Pass `filename_prefix` (from candlestick_filename_prefix) to skip rebuilding the invariant part per image.
+    """
+    if filename_prefix is None:
+        filename_prefix = candlestick_filename_prefix(ticker, timeframe, window_size)
+    if trend_strength is not None:
+        # Format trend_strength to 3 decimal places with _trend_ prefix
+        return ''.join((filename_prefix, end_date, f"_trend_{trend_strength:.3f}", ".png"))
+    return ''.join((filename_prefix, end_date, ".png"))
+
+def save_candlestick_image(image, ticker, timeframe, window_size, end_date, output_folder, trend_strength=None,
+                           filename_prefix=None, output_prefix=None):
     """Save the candlestick image with a filename based on the ticker, timeframe, window size, and end date.
-    
+
     Args:
-        image: PIL Image object to save
+        image: PIL Image object to save, or PNG bytes from encode_candlestick_image
         ticker: Ticker symbol
         timeframe: Timeframe (e.g., '1d', '1h')
         window_size: Number of candles in the image
         end_date: End date string
         output_folder: Output directory path
         trend_strength: Optional trend strength value to include at end of filename
+        filename_prefix: Optional precomputed candlestick_filename_prefix
+        output_prefix: Optional output_folder already joined with a trailing separator
     """
-    if trend_strength is not None:
-        # Format trend_strength to 3 decimal places with _trend_ prefix
-        filename = f"{ticker}_{timeframe}_{window_size}c_{end_date}_trend_{trend_strength:.3f}.png"
+    filename = candlestick_image_filename(ticker, timeframe, window_size, end_date, trend_strength,
+                                          filename_prefix)
+
+    if output_prefix is None:
+        output_prefix = os.path.join(output_folder, '')
+    filepath = output_prefix + filename
+    if isinstance(image, bytes):
+        with open(filepath, 'wb') as f:
+            f.write(image)
     else:
-        filename = f"{ticker}_{timeframe}_{window_size}c_{end_date}.png"
-    
-    filepath = os.path.join(output_folder, filename)
-    image.save(filepath)
+        image.save(filepath, **PNG_SAVE_OPTIONS)
     #print(f"Saved: {filepath}")
-    return filename
\ No newline at end of file
+    return filename
@@ -1,27 +1,82 @@
 """
 Efficient multi-timeframe tree for normalized trend_price JSON files.
 
-The tree hierarchy is organized as: year -> month -> day -> hour -> minute.
-Each node stores timeframe-specific metrics (trend_strength_*, last_close_price_*).
+The year -> month -> day -> hour -> minute hierarchy is flattened into one table
+per timeframe, keyed by a packed integer (see ``_pack``) at that timeframe's
+granularity. Each entry stores the timestamp and timeframe-specific metrics
+(trend_strength_*, last_close_price_*), returned as dicts by the query API.
 """
 
 from __future__ import annotations
 
-import json
-from collections import defaultdict
-from dataclasses import dataclass, field
-from datetime import datetime, date
+import functools
+import zipfile
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import repeat
+from datetime import date
 from pathlib import Path
 from typing import Dict, Optional, List
 
+import numpy as np
+import orjson
 
-@dataclass
-class TreeNode:
-    data: Dict[str, Dict[str, float]] = field(default_factory=dict)
-    months: Dict[int, "TreeNode"] = field(default_factory=dict)
-    days: Dict[int, "TreeNode"] = field(default_factory=dict)
-    hours: Dict[int, "TreeNode"] = field(default_factory=dict)
-    minutes: Dict[int, "TreeNode"] = field(default_factory=dict)
+try:
+    import ijson
+except ImportError:  # optional; without it every file is parsed in one go with orjson
+    ijson = None
+
+
+# Bit offsets of the packed (year, month, day, hour, minute) key
+_MONTH_SHIFT = 22
+_DAY_SHIFT = 17
+_HOUR_SHIFT = 12
+_YEAR_SHIFT = 26
+_KEY_SHIFTS = (_YEAR_SHIFT, _MONTH_SHIFT, _DAY_SHIFT, _HOUR_SHIFT, 0)
+
+# Number of leading (year, month, day, hour, minute) fields in each timeframe's key
+_KEY_FIELD_COUNT = {"1mo": 2, "1wk": 3, "1d": 3, "1h": 4, "5m": 5}
+
+# Timeframes whose records make a year or day period present, by the period's key shift.
+# Month, hour and minute queries need no presence check: their result is empty exactly
+# when the period has no data
+_PERIOD_TIMEFRAMES = {
+    _YEAR_SHIFT: ("1mo", "1wk", "1d", "1h", "5m"),
+    _DAY_SHIFT: ("1d", "1h", "5m"),
+}
+
+# Parsed tables are cached as arrays next to the timeframe folders; bump the version when their layout changes
+_CACHE_FILENAME = ".tree_cache.npz"
+_CACHE_VERSION = 5
+
+# Maximum number of cached month/week listings per tree
+_QUERY_CACHE_SIZE = 4096
+
+# trend_price files above this size are stream-parsed with ijson when it is installed
+_STREAM_THRESHOLD_BYTES = 64 << 20
+
+
+def _pack(year: int, month: int = 0, day: int = 0, hour: int = 0, minute: int = 0) -> int:
+    """Pack a (partial) timestamp into an int that sorts chronologically."""
+    return (year << _YEAR_SHIFT) | (month << _MONTH_SHIFT) | (day << _DAY_SHIFT) | (hour << _HOUR_SHIFT) | minute
+
+
+# One stored record; returned to callers as a metrics dict
+Metric = namedtuple("Metric", "timestamp trend price")
+
+
+def _nullable_values(column: np.ndarray) -> list:
+    """A float64 cache column as a list, with the NaNs that stand for JSON null back to None."""
+    values = column.tolist()
+    for i in np.flatnonzero(np.isnan(column)).tolist():
+        values[i] = None
+    return values
+
+
+@functools.lru_cache(maxsize=4096)
+def _iso_week(year: int, month: int, day: int) -> tuple:
+    """(ISO year, ISO week) of a calendar date."""
+    return tuple(date(year, month, day).isocalendar()[:2])
 
 
 class TimeframeTree:
@@ -32,8 +87,17 @@ class TimeframeTree:
     def __init__(self, ticker: str, base_path: str = "Data_Charts_Images/output"):
         self.ticker = ticker.upper()
         self.base_path = Path(base_path)
-        self.tree: Dict[int, TreeNode] = defaultdict(TreeNode)
-        self.week_lookup: Dict[tuple, Dict[str, float]] = {}
+        self.tables: Dict[str, Dict[int, Metric]] = {tf: {} for tf in self.TIMEFRAMES}
+        self.week_lookup: Dict[tuple, Metric] = {}
+        self._metric_keys = {tf: (f"trend_strength_{tf}", f"last_close_price_{tf}") for tf in self.TIMEFRAMES}
+        # Sorted table keys for range lookups, rebuilt lazily after inserts
+        self._sorted_keys: Dict[str, Optional[List[int]]] = {tf: None for tf in self.TIMEFRAMES}
+        # Packed prefixes of the periods that hold data, per period shift, so presence checks are set lookups
+        self._periods: Dict[int, set] = {shift: set() for shift in _PERIOD_TIMEFRAMES}
+        # Newest key per timeframe, kept current on load so get_latest never scans or sorts
+        self._latest_key: Dict[str, Optional[int]] = {tf: None for tf in self.TIMEFRAMES}
+        # Month-in-year and week-in-month listings behind year and month queries, cleared whenever the tables change
+        self._query_cache: Dict[tuple, tuple] = {}
 
     # ------------------------------------------------------------------
     # Data loading
@@ -43,75 +107,164 @@ class TimeframeTree:
         if not ticker_root.exists():
             raise FileNotFoundError(f"No data found for ticker '{self.ticker}' at {ticker_root}")
 
-        for timeframe in self.TIMEFRAMES:
-            tf_file = ticker_root / timeframe / "regression_data" / f"{self.ticker}_{timeframe}_trend_price.json"
+        tf_files = {
+            tf: ticker_root / tf / "regression_data" / f"{self.ticker}_{tf}_trend_price.json"
+            for tf in self.TIMEFRAMES
+        }
+
+        # The cache is valid while every source file keeps its mtime (or stays missing)
+        signature = (_CACHE_VERSION,) + tuple(
+            (tf, path.stat().st_mtime_ns if path.exists() else None) for tf, path in tf_files.items()
+        )
+        cache_path = ticker_root / _CACHE_FILENAME
+        if self._load_cache(cache_path, signature):
+            return
+
+        for timeframe, tf_file in tf_files.items():
             if tf_file.exists():
                 self._load_timeframe_file(tf_file, timeframe)
 
-    def _load_timeframe_file(self, path: Path, timeframe: str) -> None:
-        with path.open("r") as file:
-            payload = json.load(file)
-
-        count = 0
-        for key, record in payload.items():
-            if not isinstance(record, dict):
-                continue
-
-            timestamp = record.get("timestamp")
-            trend_key = f"trend_strength_{timeframe}"
-            price_key = f"last_close_price_{timeframe}"
+        try:
+            self._save_cache(cache_path, signature)
+        except OSError:
+            pass  # Read-only output folder; the next run simply re-parses
+
+    def _save_cache(self, cache_path: Path, signature: tuple) -> None:
+        """Write the tables to an .npz cache as one column per field.
+
+        Records of every timeframe, then the week lookup, are concatenated in that order;
+        ``counts`` holds the length of each group. A null trend or price is stored as NaN.
+        """
+        groups = [list(table.values()) for table in self.tables.values()] + [list(self.week_lookup.values())]
+        metrics = [m for group in groups for m in group]
+        arrays = {
+            "manifest": np.array(orjson.dumps(signature)),
+            "counts": np.array([len(group) for group in groups], dtype=np.int64),
+            "keys": np.fromiter((k for table in self.tables.values() for k in table), dtype=np.int64,
+                                count=len(metrics) - len(self.week_lookup)),
+            "week_iso": np.array(list(self.week_lookup), dtype=np.int64).reshape(-1, 2),
+            "ts": np.array([m.timestamp for m in metrics], dtype=str),
+            "trend": np.array([m.trend for m in metrics], dtype=np.float64),
+            "price": np.array([m.price for m in metrics], dtype=np.float64),
+        }
+
+        with cache_path.open("wb") as file:
+            np.savez(file, **arrays)
+
+    def _load_cache(self, cache_path: Path, signature: tuple) -> bool:
+        """Restore tables from the .npz cache if its manifest matches ``signature``."""
+        try:
+            with np.load(cache_path, allow_pickle=False) as cache:
+                if cache["manifest"].item() != orjson.dumps(signature):
+                    return False
+                counts = cache["counts"].tolist()
+                keys = cache["keys"]
+                week_iso = cache["week_iso"].tolist()
+                # tuple.__new__ builds each Metric in C, skipping the namedtuple's Python-level __new__
+                metrics = list(map(tuple.__new__, repeat(Metric), zip(
+                    cache["ts"].tolist(), _nullable_values(cache["trend"]), _nullable_values(cache["price"]))))
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return False  # Missing, corrupt or from an older layout
+        if len(counts) != len(self.TIMEFRAMES) + 1 or sum(counts) != len(metrics):
+            return False
+
+        tables, key_arrays = {}, {}
+        start = 0
+        for timeframe, count in zip(self.TIMEFRAMES, counts):
+            key_arrays[timeframe] = keys[start:start + count]
+            tables[timeframe] = dict(zip(key_arrays[timeframe].tolist(), metrics[start:start + count]))
+            start += count
+
+        self.tables = tables
+        self.week_lookup = dict(zip(map(tuple, week_iso), metrics[start:]))
+        self._sorted_keys = {tf: None for tf in self.TIMEFRAMES}
+        self._periods = {shift: set() for shift in _PERIOD_TIMEFRAMES}
+        for timeframe, timeframe_keys in key_arrays.items():
+            self._index_periods(timeframe, timeframe_keys)
+        self._latest_key = {tf: max(table) if table else None for tf, table in tables.items()}
+        self.clear_query_cache()
+        return True
 
-            if not timestamp or trend_key not in record or price_key not in record:
-                continue
-
-            dt = datetime.fromisoformat(timestamp)
-            metrics = {
-                "timestamp": timestamp,
-                trend_key: record[trend_key],
-                price_key: record[price_key],
-            }
+    def _load_timeframe_file(self, path: Path, timeframe: str) -> None:
+        trend_key, price_key = self._metric_keys[timeframe]
 
-            self._insert(dt, timeframe, metrics)
-            count += 1
+        # Large files are streamed record by record so the full payload is never resident
+        if ijson is not None and path.stat().st_size > _STREAM_THRESHOLD_BYTES:
+            with path.open("rb") as file:
+                records = (record for _, record in ijson.kvitems(file, "", use_float=True))
+                items = self._metric_items(records, trend_key, price_key)
+        else:
+            items = self._metric_items(orjson.loads(path.read_bytes()).values(), trend_key, price_key)
 
-        if count == 0:
+        if not items:
             print(f"Warning: no records loaded from {path}")
-
-    # ------------------------------------------------------------------
-    # Tree insertion helpers
-    # ------------------------------------------------------------------
-    def _insert(self, dt: datetime, timeframe: str, metrics: Dict[str, float]) -> None:
-        year_node = self.tree[dt.year]
-        month_node = year_node.months.setdefault(dt.month, TreeNode())
-
-        if timeframe == "1mo":
-            month_node.data[timeframe] = metrics
             return
 
-        if timeframe == "1wk":
-            iso_year, iso_week, _ = dt.isocalendar()
-            week_key = (iso_year, iso_week)
-            self.week_lookup[week_key] = metrics
-            month_node.data.setdefault("1wk", {})
-            month_node.data["1wk"][iso_week] = metrics
-            return
-
-        day_node = month_node.days.setdefault(dt.day, TreeNode())
+        # Parse all timestamps at once and split them into calendar fields
+        ts = np.array([item[0] for item in items], dtype="datetime64[s]")
+        months_since_epoch = ts.astype("datetime64[M]")
+        days_since_epoch = ts.astype("datetime64[D]")
+        hours_since_epoch = ts.astype("datetime64[h]")
+        years = ts.astype("datetime64[Y]").astype(np.int64) + 1970
+        months = months_since_epoch.astype(np.int64) % 12 + 1
+        days = (days_since_epoch - months_since_epoch).astype(np.int64) + 1
+        hours = (hours_since_epoch - days_since_epoch).astype(np.int64)
+        minutes = (ts.astype("datetime64[m]") - hours_since_epoch).astype(np.int64)
+
+        # Pack at the timeframe's granularity
+        fields = (years, months, days, hours, minutes)
+        keys = np.zeros(len(items), dtype=np.int64)
+        for field, shift in zip(fields[:_KEY_FIELD_COUNT[timeframe]], _KEY_SHIFTS):
+            keys |= field << shift
 
-        if timeframe == "1d":
-            day_node.data[timeframe] = metrics
-            return
+        if timeframe == "1wk":
+            for y, m, d, item in zip(years.tolist(), months.tolist(), days.tolist(), items):
+                self.week_lookup[_iso_week(y, m, d)] = item
+
+        self.tables[timeframe].update(zip(keys.tolist(), items))
+        self._sorted_keys[timeframe] = None
+        self._index_periods(timeframe, keys)
+        newest = int(keys.max())
+        latest = self._latest_key[timeframe]
+        self._latest_key[timeframe] = newest if latest is None else max(latest, newest)
+        self.clear_query_cache()
+
+    def _index_periods(self, timeframe: str, keys: np.ndarray) -> None:
+        """Add the periods that ``keys`` fall in to the presence sets ``timeframe`` contributes to."""
+        for shift, timeframes in _PERIOD_TIMEFRAMES.items():
+            if timeframe in timeframes:
+                self._periods[shift].update(np.unique(keys >> shift << shift).tolist())
+
+    @staticmethod
+    def _metric_items(records, trend_key: str, price_key: str) -> List[Metric]:
+        """A Metric for every record that carries a timestamp, trend and price."""
+        return [
+            Metric(record["timestamp"], record[trend_key], record[price_key])
+            for record in records
+            if isinstance(record, dict) and record.get("timestamp")
+            and trend_key in record and price_key in record
+        ]
 
-        hour_node = day_node.hours.setdefault(dt.hour, TreeNode())
+    # ------------------------------------------------------------------
+    # Table helpers
+    # ------------------------------------------------------------------
+    def _metrics(self, timeframe: str, item: Optional[Metric]) -> Optional[Dict[str, float]]:
+        """Materialize a stored Metric as a metrics dict."""
+        if item is None:
+            return None
+        trend_key, price_key = self._metric_keys[timeframe]
+        return {"timestamp": item.timestamp, trend_key: item.trend, price_key: item.price}
 
-        if timeframe == "1h":
-            hour_node.data[timeframe] = metrics
-            return
+    def _keys(self, timeframe: str) -> List[int]:
+        keys = self._sorted_keys[timeframe]
+        if keys is None:
+            keys = self._sorted_keys[timeframe] = sorted(self.tables[timeframe])
+        return keys
 
-        if timeframe == "5m":
-            minute_node = hour_node.minutes.setdefault(dt.minute, TreeNode())
-            minute_node.data[timeframe] = metrics
-            return
+    def _range(self, timeframe: str, lo: int, hi: int) -> List[int]:
+        """Sorted keys of ``timeframe`` in [lo, hi)."""
+        keys = self._keys(timeframe)
+        return keys[bisect_left(keys, lo):bisect_left(keys, hi)]
 
     # ------------------------------------------------------------------
     # Query API
@@ -124,59 +277,98 @@ class TimeframeTree:
         hour: Optional[int] = None,
         minute: Optional[int] = None,
     ) -> Optional[Dict[str, Dict[str, float]]]:
-        """Return timeframe metrics for the requested granularity."""
-
-        year_node = self.tree.get(year)
-        if not year_node:
-            return None
-
+        """Return timeframe metrics for the requested granularity.
+
+        A period counts as present when any timeframe stored at or below its level has a
+        record in it; otherwise the query returns None. Every call builds new dicts, so
+        callers may modify a result without affecting later queries.
+
+        Every value in a non-None result is a dict, so callers never need a type check:
+          - year only: {month: 1mo metrics}
+          - year+month: {"1mo": metrics, "1wk": {iso_week: metrics}}
+          - year+month+day: {"1d": metrics, "1wk": metrics}
+          - +hour: {"1h": metrics}; +minute: {"5m": metrics}
+        Timeframes without data for the period are left out rather than mapped to None.
+        """
+        # The period key is built up one field at a time (see _pack) as the query narrows
+        lo = year << _YEAR_SHIFT
         if month is None:
-            return {
-                m: data.data.get("1mo")
-                for m, data in year_node.months.items()
-                if "1mo" in data.data
-            }
-
-        month_node = year_node.months.get(month)
-        if not month_node:
+            if lo not in self._periods[_YEAR_SHIFT]:
+                return None
+            return self._materialize("1mo", self._listing("1mo", lo, lo + (1 << _YEAR_SHIFT)))
+
+        if not 1 <= month <= 12:
             return None
+        lo |= month << _MONTH_SHIFT
 
         if day is None:
             result: Dict[str, Dict[str, float]] = {}
-            if "1mo" in month_node.data:
-                result["1mo"] = month_node.data["1mo"]
-            if "1wk" in month_node.data:
-                result["1wk"] = month_node.data["1wk"]
+            item = self.tables["1mo"].get(lo)
+            if item is not None:
+                result["1mo"] = self._metrics("1mo", item)
+            weeks = self._listing("1wk", lo, lo + (1 << _MONTH_SHIFT))
+            if weeks:
+                result["1wk"] = self._materialize("1wk", weeks)
             return result or None
 
-        day_node = month_node.days.get(day)
-        if not day_node:
+        if not 1 <= day <= 31:
             return None
+        lo |= day << _DAY_SHIFT
 
         if hour is None:
+            # A week record alone does not make the day present
+            if lo not in self._periods[_DAY_SHIFT]:
+                return None
             result: Dict[str, Dict[str, float]] = {}
-            if "1d" in day_node.data:
-                result["1d"] = day_node.data["1d"]
-            iso_year, iso_week, _ = date(year, month, day).isocalendar()
-            week_metrics = self.week_lookup.get((iso_year, iso_week))
-            if week_metrics:
-                result["1wk"] = week_metrics
+            item = self.tables["1d"].get(lo)
+            if item is not None:
+                result["1d"] = self._metrics("1d", item)
+            item = self.week_lookup.get(_iso_week(year, month, day))
+            if item is not None:
+                result["1wk"] = self._metrics("1wk", item)
             return result or None
 
-        hour_node = day_node.hours.get(hour)
-        if not hour_node:
+        if not 0 <= hour <= 23:
             return None
+        lo |= hour << _HOUR_SHIFT
 
         if minute is None:
-            data = hour_node.data.get("1h")
-            return {"1h": data} if data else None
+            item = self.tables["1h"].get(lo)
+            return {"1h": self._metrics("1h", item)} if item is not None else None
 
-        minute_node = hour_node.minutes.get(minute)
-        if not minute_node:
+        if not 0 <= minute <= 59:
             return None
-
-        data = minute_node.data.get("5m")
-        return {"5m": data} if data else None
+        item = self.tables["5m"].get(lo | minute)
+        return {"5m": self._metrics("5m", item)} if item is not None else None
+
+    def _listing(self, timeframe: str, lo: int, hi: int) -> tuple:
+        """(month or ISO week, Metric) pairs for the 1mo or 1wk records keyed in [lo, hi).
+
+        Listings are immutable, so they are cached until the next load and turned into new
+        dicts by each query.
+        """
+        cache_key = (timeframe, lo)
+        listing = self._query_cache.get(cache_key)
+        if listing is not None:
+            return listing
+
+        table = self.tables[timeframe]
+        keys = self._range(timeframe, lo, hi)
+        if timeframe == "1mo":
+            listing = tuple(((k >> _MONTH_SHIFT) & 0xF, table[k]) for k in keys)
+        else:
+            listing = tuple(
+                (_iso_week(k >> _YEAR_SHIFT, (k >> _MONTH_SHIFT) & 0xF, (k >> _DAY_SHIFT) & 0x1F)[1], table[k])
+                for k in keys
+            )
+        if len(self._query_cache) >= _QUERY_CACHE_SIZE:
+            # FIFO eviction: dicts iterate in insertion order
+            del self._query_cache[next(iter(self._query_cache))]
+        self._query_cache[cache_key] = listing
+        return listing
+
+    def _materialize(self, timeframe: str, listing: tuple) -> Dict[int, Dict[str, float]]:
+        return {label: self._metrics(timeframe, item) for label, item in listing}
 
     # ------------------------------------------------------------------
     # Utilities
@@ -185,53 +377,15 @@ class TimeframeTree:
         if timeframe not in self.TIMEFRAMES:
             raise ValueError(f"Unsupported timeframe '{timeframe}'")
 
-        for year in sorted(self.tree.keys(), reverse=True):
-            year_node = self.tree[year]
-            for month in sorted(year_node.months.keys(), reverse=True):
-                month_node = year_node.months[month]
-                if timeframe == "1mo" and "1mo" in month_node.data:
-                    return month_node.data["1mo"]
-
-                if timeframe == "1wk" and "1wk" in month_node.data:
-                    weeks = month_node.data["1wk"]
-                    latest_week = sorted(weeks.keys(), reverse=True)[0]
-                    return weeks[latest_week]
-
-                for day in sorted(month_node.days.keys(), reverse=True):
-                    day_node = month_node.days[day]
-                    if timeframe == "1d" and "1d" in day_node.data:
-                        return day_node.data["1d"]
-
-                    for hour in sorted(day_node.hours.keys(), reverse=True):
-                        hour_node = day_node.hours[hour]
-                        if timeframe == "1h" and "1h" in hour_node.data:
-                            return hour_node.data["1h"]
-
-                        if timeframe == "5m":
-                            for minute in sorted(hour_node.minutes.keys(), reverse=True):
-                                minute_node = hour_node.minutes[minute]
-                                if "5m" in minute_node.data:
-                                    return minute_node.data["5m"]
-        return None
+        key = self._latest_key[timeframe]
+        return self._metrics(timeframe, self.tables[timeframe][key]) if key is not None else None
+
+    def clear_query_cache(self) -> None:
+        """Drop the cached month and week listings; the next year/month query rebuilds them."""
+        self._query_cache.clear()
 
     def get_stats(self) -> Dict[str, int]:
-        counts = {tf: 0 for tf in self.TIMEFRAMES}
-        for year_node in self.tree.values():
-            for month_node in year_node.months.values():
-                if "1mo" in month_node.data:
-                    counts["1mo"] += 1
-                if "1wk" in month_node.data:
-                    counts["1wk"] += len(month_node.data["1wk"])
-                for day_node in month_node.days.values():
-                    if "1d" in day_node.data:
-                        counts["1d"] += 1
-                    for hour_node in day_node.hours.values():
-                        if "1h" in hour_node.data:
-                            counts["1h"] += 1
-                        for minute_node in hour_node.minutes.values():
-                            if "5m" in minute_node.data:
-                                counts["5m"] += 1
-        return counts
+        return {tf: len(table) for tf, table in self.tables.items()}
 
 
 def main() -> None:
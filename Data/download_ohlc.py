@@ -1,11 +1,16 @@
 import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
+from functools import partial
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 import yaml
 import yfinance as yf
 
+OUTPUT_FORMATS = ("csv", "parquet")
+
 
 def get_supported_intervals() -> List[str]:
     # From yfinance docs/source as of 2025-10: minute to monthly
@@ -57,6 +62,19 @@ def parse_args() -> argparse.Namespace:
         help="Override: single interval to download (ignores config intervals)",
     )
     
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=None,
+        help="Override: output file format (default: config output_format, else csv)",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-download even files that are newer than the config cache_ttl_minutes",
+    )
+
     parser.add_argument(
         "--list-intervals",
         action="store_true",
@@ -66,6 +84,90 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def output_path(ticker: str, interval: str, output_format: str) -> Path:
+    """Data/[TICKER]/[TICKER]_[INTERVAL].[csv|parquet]"""
+    ticker_upper = ticker.upper()
+    return Path("Data") / ticker_upper / f"{ticker_upper}_{interval}.{output_format}"
+
+
+def is_fresh(path: Path, ttl_seconds: float) -> bool:
+    """True if ``path`` exists and was written less than ``ttl_seconds`` ago."""
+    try:
+        return time.time() - path.stat().st_mtime < ttl_seconds
+    except FileNotFoundError:
+        return False
+
+
+INTRADAY_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
+
+
+def download_interval(
+    interval: str,
+    tickers: List[str],
+    start_date: str,
+    end_date: str,
+    intraday_period: str,
+    one_minute_period: str,
+    output_format: str,
+) -> Tuple[List[str], List[Tuple[str, str, int]]]:
+    """Download one interval for all tickers and save a file per ticker.
+
+    Returns the status lines to print and a (ticker, interval, rows) result per ticker.
+    """
+    lines = []
+    results = []
+
+    # One threaded multi-ticker request per interval instead of one request per (ticker, interval)
+    try:
+        if interval in INTRADAY_INTERVALS:
+            period = one_minute_period if interval == "1m" else intraday_period
+            df = yf.download(
+                tickers,
+                period=period,
+                interval=interval,
+                progress=False,
+                threads=True,
+            )
+        else:
+            df = yf.download(
+                tickers,
+                start=start_date,
+                end=end_date,
+                interval=interval,
+                progress=False,
+                threads=True,
+            )
+    except Exception as e:
+        for ticker in tickers:
+            lines.append(f"✗ {ticker} {interval}: {e}")
+            results.append((ticker, interval, 0))
+        return lines, results
+
+    for ticker in tickers:
+        try:
+            ticker_upper = ticker.upper()
+            # Keep the (Price, Ticker) column levels so the CSV header matches a single-ticker
+            # download, and drop rows that only exist for the other tickers
+            ticker_df = df.xs(ticker_upper, axis=1, level="Ticker", drop_level=False).dropna(how="all")
+
+            # Create directory structure: Data/[symbol]/
+            out_path = output_path(ticker, interval, output_format)
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            if output_format == "parquet":
+                # Typed columns need no header rows; the single-level frame loads directly
+                ticker_df.droplevel("Ticker", axis=1).to_parquet(out_path, compression="zstd")
+            else:
+                ticker_df.to_csv(out_path)
+            lines.append(f"✓ {out_path}: {len(ticker_df):,} rows")
+            results.append((ticker, interval, len(ticker_df)))
+        except Exception as e:
+            lines.append(f"✗ {ticker} {interval}: {e}")
+            results.append((ticker, interval, 0))
+
+    return lines, results
+
+
 def main() -> None:
     args = parse_args()
 
@@ -95,52 +197,50 @@ def main() -> None:
     end_date = args.end
     intraday_period = config.get('intraday_period', '60d')
     one_minute_period = config.get('one_minute_period', '7d')
+    output_format = args.format or config.get('output_format', 'csv')
+    if output_format not in OUTPUT_FORMATS:
+        raise SystemExit(f"Error: output_format must be one of {', '.join(OUTPUT_FORMATS)}, got {output_format!r}")
+    ttl_seconds = 0 if args.force else config.get('cache_ttl_minutes', 0) * 60
     
     print(f"Downloading data for {len(tickers)} ticker(s) across {len(intervals_to_fetch)} interval(s)...")
     print(f"Tickers: {', '.join(tickers)}")
     print(f"Intervals: {', '.join(intervals_to_fetch)}\n")
 
-    intraday_set = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
     all_results = []
-    
-    for ticker in tickers:
-        print(f"\n{'='*60}")
-        print(f"Processing {ticker}")
-        print(f"{'='*60}")
-        
-        for interval in intervals_to_fetch:
-            try:
-                if interval in intraday_set:
-                    period = one_minute_period if interval == "1m" else intraday_period
-                    df = yf.download(
-                        ticker,
-                        period=period,
-                        interval=interval,
-                        progress=False,
-                        threads=False,
-                    )
-                else:
-                    df = yf.download(
-                        ticker,
-                        start=start_date,
-                        end=end_date,
-                        interval=interval,
-                        progress=False,
-                        threads=False,
-                    )
-
-                # Create directory structure: Data/[symbol]/
-                ticker_upper = ticker.upper()
-                data_dir = Path("Data") / ticker_upper
-                data_dir.mkdir(parents=True, exist_ok=True)
-                out_path = data_dir / f"{ticker_upper}_{interval}.csv"
-                
-                df.to_csv(out_path)
-                print(f"✓ {out_path}: {len(df):,} rows")
-                all_results.append((ticker, interval, len(df)))
-            except Exception as e:
-                print(f"✗ {ticker} {interval}: {e}")
-                all_results.append((ticker, interval, 0))
+    skipped = []
+
+    # Files written within the TTL are kept as they are; only stale tickers are requested
+    jobs = []
+    for interval in intervals_to_fetch:
+        stale = []
+        for ticker in tickers:
+            if ttl_seconds and is_fresh(output_path(ticker, interval, output_format), ttl_seconds):
+                skipped.append((ticker, interval))
+            else:
+                stale.append(ticker)
+        if stale:
+            jobs.append((interval, stale))
+
+    # Intervals are fetched concurrently, one process each: yf.download keeps its results in
+    # module-level state, so concurrent calls in threads of one process would clobber each other
+    fetch = partial(
+        download_interval,
+        start_date=start_date,
+        end_date=end_date,
+        intraday_period=intraday_period,
+        one_minute_period=one_minute_period,
+        output_format=output_format,
+    )
+    with ProcessPoolExecutor(max_workers=max(1, len(jobs))) as pool:
+        job_intervals = [interval for interval, _ in jobs]
+        job_tickers = [stale for _, stale in jobs]
+        for interval, (lines, results) in zip(job_intervals, pool.map(fetch, job_intervals, job_tickers)):
+            print(f"\n{'='*60}")
+            print(f"Processing {interval}")
+            print(f"{'='*60}")
+            for line in lines:
+                print(line)
+            all_results.extend(results)
 
     # Summary
     print("\n" + "="*60)
@@ -149,6 +249,8 @@ def main() -> None:
     for ticker, interval, nrows in all_results:
         status = "✓" if nrows > 0 else "✗"
         print(f"{status} {ticker:6s} {interval:5s}: {nrows:,} rows")
+    for ticker, interval in skipped:
+        print(f"• {ticker:6s} {interval:5s}: up to date (newer than {ttl_seconds / 60:g} min), skipped")
 
 
 if __name__ == "__main__":
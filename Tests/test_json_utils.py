@@ -0,0 +1,69 @@
+"""
+Assertions for the helpers in Charts/json_utils.py.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+# The Charts modules import each other by bare name, so put the folder itself on the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Charts')))
+
+from json_utils import _extract_timestamp_from_key, _trend_kernel, _SHAPE_TABLE
+
+
+@pytest.mark.parametrize("key, expected", [
+    ("SLV_1d_25c_2025-10-30.png", datetime(2025, 10, 30)),
+    ("SLV_1h_25c_2025-10-30 14-05-09.png", datetime(2025, 10, 30, 14, 5, 9)),
+    ("SLV_1h_25c_2025-10-30 14-05-09_trend_-1.234.png", datetime(2025, 10, 30, 14, 5, 9)),
+    # An invalid date is skipped in favour of the next valid segment
+    ("SLV_2025-13-01_25c_2025-10-30.png", datetime(2025, 10, 30)),
+])
+def test_extract_timestamp_from_key(key, expected):
+    assert _extract_timestamp_from_key(key) == expected
+
+
+@pytest.mark.parametrize("key", [
+    "SLV_1d_25c_2025-02-30.png",
+    "SLV_1h_25c_2025-10-30 25-00-00.png",
+    "SLV_1d_25c.png",
+    # Dates must fill a whole '_'-delimited segment
+    "SLV_1d_25c_x2025-10-30.png",
+])
+def test_extract_timestamp_from_key_rejects_invalid_dates(key):
+    assert _extract_timestamp_from_key(key) is None
+
+
+def kernel_inputs(max_dev, price_change, colored_pixels_ratio, slopes):
+    return (np.array(max_dev, dtype=np.float64), np.array(price_change, dtype=np.float64),
+            np.array(colored_pixels_ratio, dtype=np.float64), np.array(slopes, dtype=np.float64))
+
+
+def test_trend_kernel_matches_the_scalar_formula():
+    inputs = kernel_inputs([1.0, 3.0], [2.0, -4.0], [0.5, 1.5], [[1, -1, 1, -1], [-1, -1, -1, 1]])
+    trend, masks = _trend_kernel(*inputs)
+
+    # max_dev mean 2, colored_pixels mean 1: trend = -price_change / (max_dev / 2) / colored_pixels_ratio
+    np.testing.assert_allclose(trend, [-2.0 / 0.5 / 0.5, 4.0 / 1.5 / 1.5])
+    assert [_SHAPE_TABLE[m] for m in masks.tolist()] == ["pnpn", "nnnp"]
+
+
+def test_trend_kernel_zero_max_dev_mean_gives_zero_trend():
+    trend, _ = _trend_kernel(*kernel_inputs([0.0, 0.0], [2.0, -4.0], [0.5, 1.5], [[1] * 4, [1] * 4]))
+    assert trend.tolist() == [0.0, 0.0]
+
+
+def test_trend_kernel_zero_colored_pixels_mean_skips_that_normalization():
+    trend, _ = _trend_kernel(*kernel_inputs([1.0, 3.0], [2.0, -4.0], [0.0, 0.0], [[1] * 4, [1] * 4]))
+    np.testing.assert_allclose(trend, [-2.0 / 0.5, 4.0 / 1.5])
+    assert np.isfinite(trend).all()
+
+
+def test_trend_kernel_zero_record_is_zero_not_nan():
+    # One record with max_dev 0 while the mean is non-zero must not divide by zero
+    trend, _ = _trend_kernel(*kernel_inputs([0.0, 2.0], [1.0, 1.0], [1.0, 1.0], [[1] * 4, [1] * 4]))
+    assert trend[0] == 0.0
+    assert np.isfinite(trend).all()
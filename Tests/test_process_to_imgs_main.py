@@ -0,0 +1,137 @@
+"""
+Assertions for the render-complete marker and data file discovery in Charts/process_to_imgs_main.py.
+
+Each test renders a small synthetic price series under pytest's tmp_path.
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The Charts modules import each other by bare name, so put the folder itself on the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Charts')))
+
+import process_to_imgs_main
+from process_to_imgs_main import process_data_into_images, is_up_to_date, find_data_files, _RENDER_MARKER
+
+PARAMS = dict(window_size=8, height=32, overlap=4, blur=False, blur_radius=0, draw_regression_lines=True,
+              color_candles=True, create_regression_labels=True, trend_strength_to_img_name=False,
+              regression_format='parquet')
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """A 30-day OHLCV Parquet file in the layout written by Data/download_ohlc.py."""
+    close = 20 + np.sin(np.arange(30))
+    data = pd.DataFrame({'Open': close - 0.1, 'High': close + 0.5, 'Low': close - 0.5, 'Close': close,
+                         'Volume': 1000.0},
+                        index=pd.date_range('2025-01-01', periods=30, freq='D', tz='UTC', name='Date'))
+    path = tmp_path / 'SLV_1d.parquet'
+    data.to_parquet(path)
+    return str(path)
+
+
+@pytest.fixture
+def output_folder(tmp_path):
+    return str(tmp_path / 'images')
+
+
+def render(data_file, output_folder, **overrides):
+    params = {**PARAMS, **overrides}
+    process_data_into_images(data_file, 'SLV', '1d', output_folder=output_folder,
+                             regression_folder=os.path.dirname(output_folder), **params)
+
+
+def test_completed_run_is_up_to_date(data_file, output_folder):
+    render(data_file, output_folder)
+    assert os.path.exists(os.path.join(output_folder, _RENDER_MARKER))
+    assert is_up_to_date(data_file, output_folder, PARAMS)
+
+
+def test_interrupted_run_leaves_no_marker(data_file, output_folder, monkeypatch):
+    render(data_file, output_folder)
+    save = process_to_imgs_main.save_candlestick_image
+    saved = []
+
+    def save_then_fail(*args, **kwargs):
+        if len(saved) == 2:
+            raise Interrupted
+        saved.append(save(*args, **kwargs))
+
+    monkeypatch.setattr(process_to_imgs_main, 'save_candlestick_image', save_then_fail)
+    with pytest.raises(Interrupted):
+        render(data_file, output_folder)
+
+    assert not os.path.exists(os.path.join(output_folder, _RENDER_MARKER))
+    assert not is_up_to_date(data_file, output_folder, PARAMS)
+
+
+def test_marker_is_removed_before_the_folder_is_cleared(data_file, output_folder, monkeypatch):
+    render(data_file, output_folder)
+    marker_path = os.path.join(output_folder, _RENDER_MARKER)
+    marker_present = []
+
+    def interrupted_clear(*args, **kwargs):
+        marker_present.append(os.path.exists(marker_path))
+        raise Interrupted
+
+    # Only PNGs and the marker are in the folder, so clearing goes through rmtree
+    monkeypatch.setattr(process_to_imgs_main.shutil, 'rmtree', interrupted_clear)
+    with pytest.raises(Interrupted):
+        render(data_file, output_folder)
+
+    assert marker_present == [False]
+    assert not is_up_to_date(data_file, output_folder, PARAMS)
+
+
+def test_touched_data_file_is_not_up_to_date(data_file, output_folder):
+    render(data_file, output_folder)
+    # Force a distinct mtime even on filesystems with coarse timestamps
+    mtime_ns = os.stat(data_file).st_mtime_ns + 10**9
+    os.utime(data_file, ns=(mtime_ns, mtime_ns))
+    assert not is_up_to_date(data_file, output_folder, PARAMS)
+
+
+@pytest.mark.parametrize("change", [dict(height=64), dict(overlap=3), dict(blur=True),
+                                    dict(regression_format='json')])
+def test_changed_params_are_not_up_to_date(data_file, output_folder, change):
+    render(data_file, output_folder)
+    assert not is_up_to_date(data_file, output_folder, {**PARAMS, **change})
+
+
+def test_missing_marker_is_not_up_to_date(data_file, output_folder):
+    os.makedirs(output_folder)
+    assert not is_up_to_date(data_file, output_folder, PARAMS)
+
+
+def write_data_files(folder, mtimes):
+    """Create empty data files named in `mtimes` with the given modification times (seconds)."""
+    for name, mtime in mtimes.items():
+        path = folder / name
+        path.write_bytes(b'')
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.parametrize("newest", ['SLV_1d.csv', 'SLV_1d.parquet'])
+def test_find_data_files_prefers_the_newest_copy(tmp_path, capsys, newest):
+    older = 'SLV_1d.parquet' if newest == 'SLV_1d.csv' else 'SLV_1d.csv'
+    write_data_files(tmp_path, {older: 1_000_000, newest: 2_000_000, 'SLV_1h.csv': 1_500_000})
+
+    assert find_data_files(str(tmp_path), '1d') == [newest, older]
+    assert capsys.readouterr().out == (f"⚠ SLV_1d exists as both CSV and Parquet; using the newer file, "
+                                       f"ignoring {older}\n")
+
+
+def test_find_data_files_single_format_does_not_warn(tmp_path, capsys):
+    write_data_files(tmp_path, {'SLV_1d.parquet': 1_000_000, 'SLV_1h.csv': 2_000_000, 'notes.txt': 3_000_000})
+
+    assert find_data_files(str(tmp_path)) == ['SLV_1h.csv', 'SLV_1d.parquet']
+    assert find_data_files(str(tmp_path), '1d') == ['SLV_1d.parquet']
+    assert capsys.readouterr().out == ''
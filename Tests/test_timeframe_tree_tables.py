@@ -0,0 +1,182 @@
+"""
+Assertions for TimeframeTree key packing, query bounds and the on-disk table cache.
+
+Each test builds its own small trend_price tree under pytest's tmp_path.
+"""
+
+import sys
+import os
+import copy
+
+import orjson
+import pytest
+
+# Add parent directory to path to import the Charts module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Charts.timeframe_tree import (TimeframeTree, _pack, _CACHE_FILENAME, _MONTH_SHIFT, _DAY_SHIFT,
+                                   _HOUR_SHIFT, _YEAR_SHIFT)
+
+TICKER = "SLV"
+
+# Records either side of a year, month, day and hour boundary
+TIMESTAMPS = {
+    "1mo": ["2024-12-01T00:00:00", "2025-01-01T00:00:00", "2025-02-01T00:00:00"],
+    "1wk": ["2025-01-27T00:00:00", "2025-02-03T00:00:00"],
+    "1d": ["2024-12-31T00:00:00", "2025-01-31T00:00:00", "2025-02-01T00:00:00"],
+    "1h": ["2025-01-31T23:00:00", "2025-02-01T00:00:00"],
+    "5m": ["2024-12-31T23:55:00", "2025-01-31T23:55:00", "2025-02-01T00:00:00"],
+}
+
+
+def write_timeframe(base_path, timeframe, timestamps, price=10.0):
+    """Write a trend_price file for `timeframe` with one record per timestamp."""
+    folder = base_path / TICKER / timeframe / "regression_data"
+    folder.mkdir(parents=True, exist_ok=True)
+    records = {"_comments": ["test data"]}
+    for i, timestamp in enumerate(timestamps):
+        records[f"{TICKER}_{timeframe}_{i}.png"] = {
+            "shape": "pnpn",
+            f"trend_strength_{timeframe}": float(i),
+            f"last_close_price_{timeframe}": price,
+            "timestamp": timestamp,
+        }
+    path = folder / f"{TICKER}_{timeframe}_trend_price.json"
+    path.write_bytes(orjson.dumps(records))
+    return path
+
+
+@pytest.fixture
+def base_path(tmp_path):
+    for timeframe, timestamps in TIMESTAMPS.items():
+        write_timeframe(tmp_path, timeframe, timestamps)
+    return tmp_path
+
+
+def load_tree(base_path):
+    tree = TimeframeTree(TICKER, base_path=str(base_path))
+    tree.load_all_timeframes()
+    return tree
+
+
+def test_pack_fields_round_trip_at_their_maximums():
+    key = _pack(2099, 12, 31, 23, 59)
+    assert key >> _YEAR_SHIFT == 2099
+    assert (key >> _MONTH_SHIFT) & 0xF == 12
+    assert (key >> _DAY_SHIFT) & 0x1F == 31
+    assert (key >> _HOUR_SHIFT) & 0x1F == 23
+    assert key & 0xFFF == 59
+
+
+def test_pack_sorts_chronologically_across_boundaries():
+    ordered = [
+        (2024, 12, 31, 23, 59),
+        (2025, 1, 1, 0, 0),
+        (2025, 1, 31, 23, 59),
+        (2025, 2, 1, 0, 0),
+        (2025, 2, 1, 0, 59),
+        (2025, 2, 1, 1, 0),
+    ]
+    keys = [_pack(*fields) for fields in ordered]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+    # A partial key is the lower bound of its period
+    assert _pack(2025) <= _pack(2025, 1, 1, 0, 0) < _pack(2026)
+
+
+def test_queries_resolve_records_on_each_side_of_a_boundary(base_path):
+    tree = load_tree(base_path)
+
+    assert tree.query(2025, 1, 31, 23, 55)["5m"]["timestamp"] == "2025-01-31T23:55:00"
+    assert tree.query(2025, 2, 1, 0, 0)["5m"]["timestamp"] == "2025-02-01T00:00:00"
+    assert tree.query(2024, 12, 31, 23, 55)["5m"]["timestamp"] == "2024-12-31T23:55:00"
+    assert tree.query(2025, 1, 31, 23)["1h"]["timestamp"] == "2025-01-31T23:00:00"
+    assert tree.query(2025, 1, 31)["1d"]["timestamp"] == "2025-01-31T00:00:00"
+    assert tree.query(2025, 1, 31)["1wk"]["timestamp"] == "2025-01-27T00:00:00"
+    assert tree.query(2025, 2)["1mo"]["timestamp"] == "2025-02-01T00:00:00"
+    assert list(tree.query(2025)) == [1, 2]
+
+    # Neighbouring minutes and hours with no record of their own
+    assert tree.query(2025, 1, 31, 23, 50) is None
+    assert tree.query(2025, 1, 31, 22) is None
+    assert tree.query(2023) is None
+
+
+@pytest.mark.parametrize("fields", [
+    (2025, 0),
+    (2025, 13),
+    (2025, 1, 0),
+    (2025, 1, 32),
+    (2025, 1, 31, -1),
+    (2025, 1, 31, 24),
+    (2025, 1, 31, 23, -1),
+    (2025, 1, 31, 23, 60),
+])
+def test_out_of_range_fields_return_none(base_path, fields):
+    assert load_tree(base_path).query(*fields) is None
+
+
+def test_modifying_a_result_does_not_affect_later_queries(base_path):
+    tree = load_tree(base_path)
+    for fields in [(2025,), (2025, 1), (2025, 1, 31), (2025, 1, 31, 23), (2025, 1, 31, 23, 55)]:
+        expected = copy.deepcopy(tree.query(*fields))
+        result = tree.query(*fields)
+        for value in result.values():
+            value.clear()
+        result.clear()
+        assert tree.query(*fields) == expected
+
+
+def test_get_latest_returns_newest_record(base_path):
+    tree = load_tree(base_path)
+    assert tree.get_latest("5m")["timestamp"] == "2025-02-01T00:00:00"
+    assert tree.get_latest("1mo")["timestamp"] == "2025-02-01T00:00:00"
+    with pytest.raises(ValueError):
+        tree.get_latest("2m")
+
+
+def test_second_load_is_served_from_the_cache(base_path, monkeypatch):
+    first = load_tree(base_path)
+    assert (base_path / TICKER / _CACHE_FILENAME).exists()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("trend_price file parsed despite a valid cache")
+
+    monkeypatch.setattr(TimeframeTree, "_load_timeframe_file", fail)
+    cached = load_tree(base_path)
+    assert cached.get_stats() == first.get_stats()
+    assert cached.week_lookup == first.week_lookup
+    assert cached.query(2025, 1, 31) == first.query(2025, 1, 31)
+    assert cached.get_latest("5m") == first.get_latest("5m")
+
+
+def test_cache_round_trips_floats_and_nulls(base_path):
+    path = write_timeframe(base_path, "1d", TIMESTAMPS["1d"], price=12.345678901234567)
+    records = orjson.loads(path.read_bytes())
+    records[f"{TICKER}_1d_1.png"]["trend_strength_1d"] = None
+    path.write_bytes(orjson.dumps(records))
+
+    parsed = load_tree(base_path)
+    cached = load_tree(base_path)
+    assert cached.tables == parsed.tables
+    assert cached.week_lookup == parsed.week_lookup
+    day = cached.query(2025, 1, 31)["1d"]
+    assert day["trend_strength_1d"] is None
+    assert day["last_close_price_1d"] == 12.345678901234567
+
+
+def test_cache_is_invalidated_when_a_source_file_changes(base_path):
+    assert load_tree(base_path).query(2025, 1, 31)["1d"]["last_close_price_1d"] == 10.0
+
+    path = write_timeframe(base_path, "1d", TIMESTAMPS["1d"], price=20.0)
+    # Force a distinct mtime even on filesystems with coarse timestamps
+    mtime_ns = path.stat().st_mtime_ns + 10**9
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    assert load_tree(base_path).query(2025, 1, 31)["1d"]["last_close_price_1d"] == 20.0
+
+
+def test_corrupt_cache_falls_back_to_parsing(base_path):
+    expected = load_tree(base_path).get_stats()
+    (base_path / TICKER / _CACHE_FILENAME).write_bytes(b"not an npz archive")
+    assert load_tree(base_path).get_stats() == expected